@@ -2,17 +2,22 @@
 Copyright (C) 2022 Sebastian Thomschke and contributors
 SPDX-License-Identifier: AGPL-3.0-or-later
 """
-import atexit, copy, getopt, importlib.metadata, json, logging, os, re, signal, shutil, sys, textwrap, time, urllib
-from collections.abc import Iterable
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import atexit, getopt, importlib.metadata, json, logging, os, posixpath, re, signal, shutil, sys, textwrap, time, urllib.parse
+from collections import ChainMap
+from collections.abc import Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from types import MappingProxyType
 from typing import Any, Final
-from wcmatch import glob
 
+import urllib3
 from overrides import overrides
 from ruamel.yaml import YAML
 from selenium.common.exceptions import ElementClickInterceptedException, NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 
 from . import utils, resources, extract  # pylint: disable=W0406
@@ -25,6 +30,138 @@ LOG_ROOT:Final[logging.Logger] = logging.getLogger()
 LOG:Final[logging.Logger] = logging.getLogger("kleinanzeigen_bot")
 LOG.setLevel(logging.INFO)
 
+# condition met once the confirmation page of a published ad is shown
+PUBLISH_CONFIRMATION_URL_CONTAINED:Final = EC.url_contains("p-anzeige-aufgeben-bestaetigung.html?adId=")
+
+DEBUG_YAML:Final[YAML] = YAML()  # used to print effective ad configurations in verbose mode
+
+ADS_ID_LIST_PATTERN:Final[re.Pattern[str]] = re.compile(r"\d+(?:,\d+)*")  # e.g. "123" or "123,456,789"
+
+AD_TYPES:Final[frozenset[str]] = frozenset({"OFFER", "WANTED"})
+PRICE_TYPES:Final[frozenset[str]] = frozenset({"FIXED", "NEGOTIABLE", "GIVE_AWAY", "NOT_APPLICABLE"})
+SHIPPING_TYPES:Final[frozenset[str]] = frozenset({"PICKUP", "SHIPPING", "NOT_APPLICABLE"})
+
+# shipping option name -> (package size, package label) as shown in the shipping dialog
+SHIPPING_OPTION_MAPPING:Final[Mapping[str, tuple[str, str]]] = MappingProxyType({
+    "DHL_2": ("Klein", "Paket 2 kg"),
+    "Hermes_Päckchen": ("Klein", "Päckchen"),
+    "Hermes_S": ("Klein", "S-Paket"),
+    "DHL_5": ("Mittel", "Paket 5 kg"),
+    "Hermes_M": ("Mittel", "M-Paket"),
+    "DHL_10": ("Mittel", "Paket 10 kg"),
+    "DHL_31,5": ("Groß", "Paket 31,5 kg"),
+    "Hermes_L": ("Groß", "L-Paket"),
+})
+
+IMAGE_FILE_EXTENSIONS:Final[frozenset[str]] = frozenset({".gif", ".jpg", ".jpeg", ".png"})
+IMAGE_DOWNLOAD_WORKERS:Final[int] = 4  # max number of images of an ad downloaded in parallel
+
+SECONDS_PER_DAY:Final[int] = 24 * 60 * 60
+
+# ad properties that decide whether an ad is skipped by load_ads
+AD_SELECTION_PROPERTIES:Final[tuple[str, ...]] = ("active", "id", "created_on", "updated_on", "republication_interval")
+
+# locators of page elements, the templates are filled in via str.format
+SITE_HEADER_XPATH:Final[str] = "/html/body/header[@id='site-header']"
+FREE_AD_LIMIT_HEADER_XPATH:Final[str] = "/html/body/div[1]/form/fieldset[6]/div[1]/header"
+SHIPPING_SIZE_RADIO_SELECTOR:Final[str] = '[class*="ShippingOption"] input[type="radio"][data-testid="{size}"]'
+SHIPPING_PACKAGE_CHECKBOX_SELECTOR:Final[str] = '[class*="CarrierOptionsPopup"] [class*="CarrierOption"] input[type="checkbox"][data-testid="{package}"]'
+AD_CREATION_DATE_SELECTOR:Final[str] = "#viewad-extra-info > div:nth-child(1) > span:nth-child(2)"
+AD_CREATION_DATE_XPATH:Final[str] = "/html/body/div[1]/div[2]/div/section[2]/section/section/article/div[3]/div[2]/div[2]/div[1]/span"  # fallback
+
+# checks the checkboxes of the given shipping packages, expects the checkbox selector template and the package names as arguments,
+# returns the names of the packages no checkbox was found for
+CHECK_SHIPPING_PACKAGES_JS:Final[str] = """
+    return arguments[1].filter(shippingPackage => {
+        const checkbox = document.querySelector(arguments[0].replace("{package}", shippingPackage));
+        if (checkbox && !checkbox.checked) {
+            checkbox.click();
+        }
+        return !checkbox;
+    });
+"""
+
+# returns the source URLs of all images contained in an ad page's gallery
+GALLERY_IMAGE_URLS_JS:Final[str] = """
+    return Array.from(document.querySelectorAll(".galleryimage-large div.galleryimage-element img"), img => img.src).filter(Boolean);
+"""
+
+# reads the texts of the ad page's title, description and creation date elements in a single round trip,
+# expects the creation date's CSS selector and the XPath used for older page layouts as arguments
+AD_PAGE_TEXTS_JS:Final[str] = """
+    const text = element => element ? element.innerText.trim() : null;
+    const creationDate = document.querySelector(arguments[0])
+        || document.evaluate(arguments[1], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return {
+        title: text(document.getElementById("viewad-title")),
+        description: text(document.getElementById("viewad-description-text")),
+        creation_date: text(creationDate)
+    };
+"""
+
+
+def _get_property(ad_cfg:dict[str, Any], path:tuple[str, ...]) -> Any:
+    # top-level properties are the common case and don't need safe_get's generic descent
+    return ad_cfg.get(path[0]) if len(path) == 1 else safe_get(ad_cfg, *path)
+
+
+def _assert_one_of(ad_cfg:dict[str, Any], ad_file:str, allowed:Iterable[str], *path:str) -> None:
+    ensure(_get_property(ad_cfg, path) in allowed, f"-> property [{'.'.join(path)}] must be one of: {set(allowed)} @ [{ad_file}]")
+
+
+def _assert_min_len(ad_cfg:dict[str, Any], ad_file:str, minlen:int, *path:str) -> None:
+    ensure(len(_get_property(ad_cfg, path)) >= minlen, f"-> property [{'.'.join(path)}] must be at least {minlen} characters long @ [{ad_file}]")
+
+
+def _assert_has_value(ad_cfg:dict[str, Any], ad_file:str, *path:str) -> None:
+    ensure(_get_property(ad_cfg, path), f"-> property [{'.'.join(path)}] not specified @ [{ad_file}]")
+
+
+def _save_ad_metadata(ad_file:str, ad_cfg:dict[str, Any]) -> None:
+    """
+    Writes the ID and timestamps of the given ad config to the ad file.
+    The file is re-read round-trip so that the user's comments and formatting are retained.
+    """
+    ad_cfg_rt = utils.load_dict(ad_file, "ad", preserve_comments = True)
+    for key in ("id", "created_on", "updated_on"):
+        if key in ad_cfg:
+            ad_cfg_rt[key] = ad_cfg[key]
+    utils.save_dict(ad_file, ad_cfg_rt)
+
+
+class PublishedAds:
+    """
+    Lookup of the ads published on the user's profile by ID and title.
+    """
+
+    def __init__(self, published_ads:Iterable[dict[str, Any]]) -> None:
+        self.titles_by_id:dict[int, str] = {}
+        self.ids_by_title:dict[str, set[int]] = {}
+        for published_ad in published_ads:
+            published_ad_id = int(published_ad.get("id", -1))
+            published_ad_title = published_ad.get("title", "")
+            self.titles_by_id[published_ad_id] = published_ad_title
+            self.ids_by_title.setdefault(published_ad_title, set()).add(published_ad_id)
+
+    def pop_matching_ids(self, ad_cfg:dict[str, Any]) -> set[int]:
+        """
+        Removes and returns the IDs of the published ads having the ID or the title of the given ad.
+
+        >>> published_ads = PublishedAds([{"id": "1", "title": "foo"}, {"id": "2", "title": "bar"}, {"id": "3", "title": "bar"}])
+        >>> sorted(published_ads.pop_matching_ids({"id": 1, "title": "bar"}))
+        [1, 2, 3]
+        >>> published_ads.pop_matching_ids({"id": 1, "title": "bar"})
+        set()
+        """
+        ad_ids = self.ids_by_title.pop(ad_cfg["title"], set())
+        if ad_cfg["id"] in self.titles_by_id:
+            ad_ids.add(ad_cfg["id"])
+        for ad_id in ad_ids:
+            published_ad_title = self.titles_by_id.pop(ad_id)
+            self.ids_by_title.get(published_ad_title, set()).discard(ad_id)
+            LOG.info(" -> deleting %s '%s'...", ad_id, published_ad_title)
+        return ad_ids
+
 
 class KleinanzeigenBot(SeleniumMixin):
 
@@ -36,9 +173,9 @@ class KleinanzeigenBot(SeleniumMixin):
         self.config:dict[str, Any] = {}
         self.config_file_path = abspath("config.yaml")
 
-        self.categories:dict[str, str] = {}
+        self.categories:Mapping[str, str] = {}
 
-        self.file_log:logging.FileHandler | None = None
+        self.file_log:MemoryHandler | None = None
         if is_frozen():
             log_file_basename = os.path.splitext(os.path.basename(sys.executable))[0]
         else:
@@ -50,9 +187,14 @@ class KleinanzeigenBot(SeleniumMixin):
         self.delete_old_ads = True
         self.delete_ads_by_title = False
 
+        self.csrf_token:str | None = None
+
+        self.http = urllib3.PoolManager(maxsize = IMAGE_DOWNLOAD_WORKERS)  # used to download images of ads
+
     def __del__(self) -> None:
         if self.file_log:
             LOG_ROOT.removeHandler(self.file_log)
+            self.file_log.close()
 
     def get_version(self) -> str:
         return importlib.metadata.version(__package__)
@@ -96,7 +238,7 @@ class KleinanzeigenBot(SeleniumMixin):
             case "download":
                 self.configure_file_logging()
                 # ad IDs depends on selector
-                if not (self.ads_selector in {'all', 'new'} or re.compile(r'\d+[,\d+]*').search(self.ads_selector)):
+                if not (self.ads_selector in {'all', 'new'} or ADS_ID_LIST_PATTERN.fullmatch(self.ads_selector)):
                     LOG.warning('You provided no ads selector. Defaulting to "new".')
                     self.ads_selector = 'new'
                 # start session
@@ -200,23 +342,53 @@ class KleinanzeigenBot(SeleniumMixin):
             return
 
         LOG.info("Logging to [%s]...", self.log_file_path)
-        self.file_log = RotatingFileHandler(filename = self.log_file_path, maxBytes = 10 * 1024 * 1024, backupCount = 10, encoding = "utf-8")
+        file_log = RotatingFileHandler(filename = self.log_file_path, maxBytes = 10 * 1024 * 1024, backupCount = 10, encoding = "utf-8")
+        file_log.setLevel(logging.DEBUG)
+        file_log.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        # buffer records to avoid a write syscall per record, buffered records are flushed on warnings/errors and by utils.on_exit
+        self.file_log = MemoryHandler(capacity = 1024, flushLevel = logging.WARNING, target = file_log)
         self.file_log.setLevel(logging.DEBUG)
-        self.file_log.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
         LOG_ROOT.addHandler(self.file_log)
 
         LOG.info("App version: %s", self.get_version())
 
-    def load_ads(self, *, ignore_inactive:bool = True, check_id:bool = True) -> list[tuple[str, dict[str, Any], dict[str, Any]]]:
+    def __find_ad_files(self, file_listings:dict[str, list[str]]) -> set[str]:
+        """
+        :param file_listings: cache of directory listings, see `utils.glob_files`
+        :return: the absolute paths of all ad files matching the configured file patterns
+        """
         LOG.info("Searching for ad config files...")
 
         ad_files = set()
         data_root_dir = os.path.dirname(self.config_file_path)
         for file_pattern in self.config["ad_files"]:
-            for ad_file in glob.glob(file_pattern, root_dir = data_root_dir, flags = glob.GLOBSTAR | glob.BRACE | glob.EXTGLOB):
+            for ad_file in utils.glob_files(data_root_dir, file_pattern, file_listings):
                 if not str(ad_file).endswith('ad_fields.yaml'):
                     ad_files.add(abspath(ad_file, relative_to = data_root_dir))
         LOG.info(" -> found %s", pluralize("ad config file", ad_files))
+        return ad_files
+
+    def __get_saved_ad_ids(self) -> set[int]:
+        """
+        Reads the IDs of all ads matching the configured file patterns without fully loading and validating the ads.
+        """
+        ad_ids:set[int] = set()
+        for ad_file in self.__find_ad_files({}):
+            ad_header = utils.peek_yaml_header(ad_file, ("id",))
+            if ad_header is None or not isinstance(ad_header.get("id"), int | None):
+                # no YAML file, the header could not be tokenized or the ID is not a plain number
+                ad_header = utils.load_dict(ad_file, "ad")
+            if not (ad_id := ad_header.get("id")):
+                continue
+            try:
+                ad_ids.add(int(ad_id))
+            except ValueError:
+                LOG.warning("Ignoring invalid ad ID [%s] @ [%s]", ad_id, ad_file)
+        return ad_ids
+
+    def load_ads(self, *, ignore_inactive:bool = True, check_id:bool = True) -> list[tuple[str, dict[str, Any], dict[str, Any]]]:
+        file_listings:dict[str, list[str]] = {}
+        ad_files = self.__find_ad_files(file_listings)
         if not ad_files:
             return []
 
@@ -224,65 +396,41 @@ class KleinanzeigenBot(SeleniumMixin):
         descr_suffix = self.config["ad_defaults"]["description"]["suffix"] or ""
 
         ad_fields = utils.load_dict_from_module(resources, "ad_fields.yaml")
-        ads = []
-        for ad_file in sorted(ad_files):
+        apply_ad_defaults = utils.compile_defaults_applier(self.config["ad_defaults"],
+            ignore = lambda k, _: k == "description", override = lambda _, v: v == "")
+        apply_ad_fields = utils.compile_defaults_applier(ad_fields)
+        apply_ad_selection_defaults = utils.compile_defaults_applier(self.config["ad_defaults"],
+            ignore = lambda k, _: k not in AD_SELECTION_PROPERTIES, override = lambda _, v: v == "")
+        apply_ad_selection_fields = utils.compile_defaults_applier(ad_fields, ignore = lambda k, _: k not in AD_SELECTION_PROPERTIES)
+
+        def load_ad(ad_file:str) -> tuple[str, dict[str, Any], dict[str, Any]] | None:
+            # cheaply check the selection related properties first to avoid fully parsing ads that are skipped anyway
+            if (ad_header := utils.peek_yaml_header(ad_file, AD_SELECTION_PROPERTIES)) is not None:
+                apply_ad_selection_fields(apply_ad_selection_defaults(ad_header))
+                if self.__is_ad_skipped(ad_file, ad_header, ignore_inactive = ignore_inactive, check_id = check_id):
+                    return None
 
             ad_cfg_orig = utils.load_dict(ad_file, "ad")
-            ad_cfg = copy.deepcopy(ad_cfg_orig)
-            apply_defaults(ad_cfg, self.config["ad_defaults"], ignore = lambda k, _: k == "description", override = lambda _, v: v == "")
-            apply_defaults(ad_cfg, ad_fields)
+            ad_cfg = utils.clone(ad_cfg_orig)
+            apply_ad_fields(apply_ad_defaults(ad_cfg))
 
-            if ignore_inactive and not ad_cfg["active"]:
-                LOG.info(" -> SKIPPED: inactive ad [%s]", ad_file)
-                continue
-
-            if self.ads_selector == "new" and ad_cfg["id"] and check_id:
-                LOG.info(" -> SKIPPED: ad [%s] is not new. already has an id assigned.", ad_file)
-                continue
-
-            if self.ads_selector == "due":
-                if ad_cfg["updated_on"]:
-                    last_updated_on = parse_datetime(ad_cfg["updated_on"])
-                elif ad_cfg["created_on"]:
-                    last_updated_on = parse_datetime(ad_cfg["created_on"])
-                else:
-                    last_updated_on = None
-
-                if last_updated_on:
-                    ad_age = datetime.utcnow() - last_updated_on
-                    if ad_age.days <= ad_cfg["republication_interval"]:
-                        LOG.info(" -> SKIPPED: ad [%s] was last published %d days ago. republication is only required every %s days",
-                            ad_file,
-                            ad_age.days,
-                            ad_cfg["republication_interval"]
-                        )
-                        continue
+            if self.__is_ad_skipped(ad_file, ad_cfg, ignore_inactive = ignore_inactive, check_id = check_id):
+                return None
 
             ad_cfg["description"] = descr_prefix + (ad_cfg["description"] or "") + descr_suffix
             ensure(len(ad_cfg["description"]) <= 4000, f"Length of ad description including prefix and suffix exceeds 4000 chars. @ [{ad_file}]")
 
-            # pylint: disable=cell-var-from-loop
-            def assert_one_of(path:str, allowed:Iterable[str]) -> None:
-                ensure(safe_get(ad_cfg, *path.split(".")) in allowed, f"-> property [{path}] must be one of: {allowed} @ [{ad_file}]")
-
-            def assert_min_len(path:str, minlen:int) -> None:
-                ensure(len(safe_get(ad_cfg, *path.split("."))) >= minlen, f"-> property [{path}] must be at least {minlen} characters long @ [{ad_file}]")
-
-            def assert_has_value(path:str) -> None:
-                ensure(safe_get(ad_cfg, *path.split(".")), f"-> property [{path}] not specified @ [{ad_file}]")
-            # pylint: enable=cell-var-from-loop
-
-            assert_one_of("type", {"OFFER", "WANTED"})
-            assert_min_len("title", 10)
-            assert_has_value("description")
-            assert_one_of("price_type", {"FIXED", "NEGOTIABLE", "GIVE_AWAY", "NOT_APPLICABLE"})
+            _assert_one_of(ad_cfg, ad_file, AD_TYPES, "type")
+            _assert_min_len(ad_cfg, ad_file, 10, "title")
+            _assert_has_value(ad_cfg, ad_file, "description")
+            _assert_one_of(ad_cfg, ad_file, PRICE_TYPES, "price_type")
             if ad_cfg["price_type"] == "GIVE_AWAY":
-                ensure(not safe_get(ad_cfg, "price"), f"-> [price] must not be specified for GIVE_AWAY ad @ [{ad_file}]")
+                ensure(not ad_cfg.get("price"), f"-> [price] must not be specified for GIVE_AWAY ad @ [{ad_file}]")
             elif ad_cfg["price_type"] == "FIXED":
-                assert_has_value("price")
-            assert_one_of("shipping_type", {"PICKUP", "SHIPPING", "NOT_APPLICABLE"})
-            assert_has_value("contact.name")
-            assert_has_value("republication_interval")
+                _assert_has_value(ad_cfg, ad_file, "price")
+            _assert_one_of(ad_cfg, ad_file, SHIPPING_TYPES, "shipping_type")
+            _assert_has_value(ad_cfg, ad_file, "contact", "name")
+            _assert_has_value(ad_cfg, ad_file, "republication_interval")
 
             if ad_cfg["id"]:
                 ad_cfg["id"] = int(ad_cfg["id"])
@@ -295,43 +443,74 @@ class KleinanzeigenBot(SeleniumMixin):
 
             if ad_cfg["images"]:
                 images = []
+                ad_dir = os.path.dirname(ad_file)
                 for image_pattern in ad_cfg["images"]:
                     pattern_images = set()
-                    ad_dir = os.path.dirname(ad_file)
-                    for image_file in glob.glob(image_pattern, root_dir = ad_dir, flags = glob.GLOBSTAR | glob.BRACE | glob.EXTGLOB):
+                    for image_file in utils.glob_files(ad_dir, image_pattern, file_listings):
                         _, image_file_ext = os.path.splitext(image_file)
-                        ensure(image_file_ext.lower() in {".gif", ".jpg", ".jpeg", ".png"}, f"Unsupported image file type [{image_file}]")
-                        if os.path.isabs(image_file):
-                            pattern_images.add(image_file)
-                        else:
-                            pattern_images.add(abspath(image_file, relative_to = ad_file))
+                        ensure(image_file_ext.lower() in IMAGE_FILE_EXTENSIONS, f"Unsupported image file type [{image_file}]")
+                        # joining with an absolute image path returns the image path
+                        pattern_images.add(os.path.normpath(os.path.join(ad_dir, image_file)))
                     images.extend(sorted(pattern_images))
                 ensure(images or not ad_cfg["images"], f"No images found for given file patterns {ad_cfg['images']} at {ad_dir}")
                 ad_cfg["images"] = list(dict.fromkeys(images))
 
-            ads.append((
+            return (
                 ad_file,
                 ad_cfg,
                 ad_cfg_orig
-            ))
+            )
+
+        # ads are independent of each other, so they are loaded concurrently; map() preserves the sort order
+        with ThreadPoolExecutor() as executor:
+            ads = [ad for ad in executor.map(load_ad, sorted(ad_files)) if ad]
 
         LOG.info("Loaded %s", pluralize("ad", ads))
         return ads
 
+    def __is_ad_skipped(self, ad_file:str, ad_cfg:dict[str, Any], *, ignore_inactive:bool, check_id:bool) -> bool:
+        if ignore_inactive and not ad_cfg["active"]:
+            LOG.info(" -> SKIPPED: inactive ad [%s]", ad_file)
+            return True
+
+        if self.ads_selector == "new" and ad_cfg["id"] and check_id:
+            LOG.info(" -> SKIPPED: ad [%s] is not new. already has an id assigned.", ad_file)
+            return True
+
+        if self.ads_selector == "due":
+            if ad_cfg["updated_on"]:
+                last_updated_on = parse_datetime(ad_cfg["updated_on"])
+            elif ad_cfg["created_on"]:
+                last_updated_on = parse_datetime(ad_cfg["created_on"])
+            else:
+                last_updated_on = None
+
+            if last_updated_on:
+                if last_updated_on.tzinfo is None:  # timestamps written by the bot are in UTC
+                    last_updated_on = last_updated_on.replace(tzinfo = timezone.utc)
+                ad_age_days = int((time.time() - last_updated_on.timestamp()) // SECONDS_PER_DAY)
+                if ad_age_days <= ad_cfg["republication_interval"]:
+                    LOG.info(" -> SKIPPED: ad [%s] was last published %d days ago. republication is only required every %s days",
+                        ad_file,
+                        ad_age_days,
+                        ad_cfg["republication_interval"]
+                    )
+                    return True
+        return False
+
     def load_config(self) -> None:
         config_defaults = utils.load_dict_from_module(resources, "config_defaults.yaml")
         config = utils.load_dict_if_exists(self.config_file_path, "config")
 
         if config is None:
             LOG.warning("Config file %s does not exist. Creating it with default values...", self.config_file_path)
-            utils.save_dict(self.config_file_path, config_defaults)
+            utils.save_dict(self.config_file_path, utils.load_dict_from_module(resources, "config_defaults.yaml", preserve_comments = True))
             config = {}
 
         self.config = apply_defaults(config, config_defaults)
 
-        self.categories = utils.load_dict_from_module(resources, "categories.yaml", "categories")
-        if self.config["categories"]:
-            self.categories.update(self.config["categories"])
+        # user defined categories take precedence, the cached built-in categories must not be modified
+        self.categories = ChainMap(self.config["categories"] or {}, utils.load_dict_from_module(resources, "categories.yaml", "categories"))
         LOG.info(" -> found %s", pluralize("category", self.categories))
 
         ensure(self.config["login"]["username"], f"[login.username] not specified @ [{self.config_file_path}]")
@@ -385,74 +564,95 @@ class KleinanzeigenBot(SeleniumMixin):
         self.webdriver.switch_to.default_content()
 
     def delete_ads(self, ad_cfgs:list[tuple[str, dict[str, Any], dict[str, Any]]]) -> None:
-        count = 0
+        """
+        Deletes the given ads using a single request.
+        """
+        LOG.info("Deleting %s if already present...", pluralize("ad", ad_cfgs))
 
-        for (ad_file, ad_cfg, _) in ad_cfgs:
-            count += 1
-            LOG.info("Processing %s/%s: '%s' from [%s]...", count, len(ad_cfgs), ad_cfg["title"], ad_file)
-            self.delete_ad(ad_cfg)
-            pause(2000, 4000)
+        if self.delete_ads_by_title:
+            published_ads = self.__get_published_ads()
+            ad_ids = set().union(*(published_ads.pop_matching_ids(ad_cfg) for (_, ad_cfg, _) in ad_cfgs))
+        else:
+            ad_ids = {ad_cfg["id"] for (_, ad_cfg, _) in ad_cfgs if ad_cfg["id"]}
+
+        if ad_ids:
+            self.__delete_ads_by_ids(ad_ids)
+            pause(1500, 3000)
+
+        for (_, ad_cfg, _) in ad_cfgs:
+            ad_cfg["id"] = None
 
         LOG.info("############################################")
-        LOG.info("DONE: Deleting %s", pluralize("ad", count))
+        LOG.info("DONE: Deleting %s", pluralize("ad", ad_cfgs))
         LOG.info("############################################")
 
-    def delete_ad(self, ad_cfg: dict[str, Any]) -> bool:
+    def delete_ad(self, ad_cfg: dict[str, Any], published_ads:PublishedAds | None = None) -> bool:
+        """
+        :param published_ads: the currently published ads, only used if `delete_ads_by_title` is enabled.
+            If not specified the published ads are requested from the server.
+        """
         LOG.info("Deleting ad '%s' if already present...", ad_cfg["title"])
 
-        self.web_open(f"{self.root_url}/m-meine-anzeigen.html")
-        csrf_token_elem = self.web_find(By.XPATH, "//meta[@name='_csrf']")
-        csrf_token = csrf_token_elem.get_attribute("content")
-
         if self.delete_ads_by_title:
-            published_ads = json.loads(self.web_request(f"{self.root_url}/m-meine-anzeigen-verwalten.json?sort=DEFAULT")["content"])["ads"]
-
-            for published_ad in published_ads:
-                published_ad_id = int(published_ad.get("id", -1))
-                published_ad_title = published_ad.get("title", "")
-                if ad_cfg["id"] == published_ad_id or ad_cfg["title"] == published_ad_title:
-                    LOG.info(" -> deleting %s '%s'...", published_ad_id, published_ad_title)
-                    self.web_request(
-                        url = f"{self.root_url}/m-anzeigen-loeschen.json?ids={published_ad_id}",
-                        method = "POST",
-                        headers = {"x-csrf-token": csrf_token}
-                    )
+            if published_ads is None:
+                published_ads = self.__get_published_ads()
+            if ad_ids_to_delete := published_ads.pop_matching_ids(ad_cfg):
+                self.__delete_ads_by_ids(ad_ids_to_delete)
         elif ad_cfg["id"]:
-            self.web_request(
-                url = f"{self.root_url}/m-anzeigen-loeschen.json?ids={ad_cfg['id']}",
-                method = "POST",
-                headers = {"x-csrf-token": csrf_token},
-                valid_response_codes = [200, 404]
-            )
+            self.__delete_ads_by_ids({ad_cfg["id"]})
 
         pause(1500, 3000)
         ad_cfg["id"] = None
         return True
 
+    def __get_published_ads(self) -> PublishedAds:
+        self.__get_csrf_token()  # opens the ads overview page so the request below is issued from within the site
+        return PublishedAds(self.web_request_json(f"{self.root_url}/m-meine-anzeigen-verwalten.json?sort=DEFAULT")["ads"])
+
+    def __get_csrf_token(self, *, refresh:bool = False) -> str:
+        """
+        :param refresh: if True the token is re-read from the ads overview page even if already known
+        :return: the CSRF token of the current session, required for modifying requests
+        """
+        if refresh or not self.csrf_token:
+            self.web_open(f"{self.root_url}/m-meine-anzeigen.html")
+            csrf_token_elem = self.web_find(By.XPATH, "//meta[@name='_csrf']")
+            self.csrf_token = csrf_token_elem.get_attribute("content")
+        return self.csrf_token
+
+    def __delete_ads_by_ids(self, ad_ids:Iterable[int]) -> None:
+        url = f"{self.root_url}/m-anzeigen-loeschen.json?ids={','.join(str(ad_id) for ad_id in sorted(ad_ids))}"
+        response = self.web_request(url, method = "POST", headers = {"x-csrf-token": self.__get_csrf_token()}, valid_response_codes = [200, 403, 404])
+        if response["statusCode"] == 403:  # cached CSRF token is no longer valid
+            self.web_request(url, method = "POST", headers = {"x-csrf-token": self.__get_csrf_token(refresh = True)}, valid_response_codes = [200, 404])
+
     def publish_ads(self, ad_cfgs:list[tuple[str, dict[str, Any], dict[str, Any]]]) -> None:
         count = 0
 
+        # the ads to be replaced are looked up once, ads published in the meantime must not be deleted anyway
+        published_ads = self.__get_published_ads() if self.delete_old_ads and self.delete_ads_by_title else None
+
         for (ad_file, ad_cfg, ad_cfg_orig) in ad_cfgs:
             count += 1
             LOG.info("Processing %s/%s: '%s' from [%s]...", count, len(ad_cfgs), ad_cfg["title"], ad_file)
-            self.publish_ad(ad_file, ad_cfg, ad_cfg_orig)
-            self.web_await(lambda _: self.webdriver.find_element(By.ID, "checking-done").is_displayed(), timeout = 5 * 60)
+            self.publish_ad(ad_file, ad_cfg, ad_cfg_orig, published_ads)
+            self.web_await(lambda _: self.webdriver.find_element(By.ID, "checking-done").is_displayed(), timeout = 5 * 60, poll_frequency = 0.1)
 
         LOG.info("############################################")
         LOG.info("DONE: (Re-)published %s", pluralize("ad", count))
         LOG.info("############################################")
 
-    def publish_ad(self, ad_file:str, ad_cfg: dict[str, Any], ad_cfg_orig: dict[str, Any]) -> None:
+    def publish_ad(self, ad_file:str, ad_cfg: dict[str, Any], ad_cfg_orig: dict[str, Any], published_ads:PublishedAds | None = None) -> None:
         self.assert_free_ad_limit_not_reached()
 
         if self.delete_old_ads:
-            self.delete_ad(ad_cfg)
+            self.delete_ad(ad_cfg, published_ads)
 
         LOG.info("Publishing ad '%s'...", ad_cfg["title"])
 
         if LOG.isEnabledFor(logging.DEBUG):
             LOG.debug(" -> effective ad meta:")
-            YAML().dump(ad_cfg, sys.stdout)
+            DEBUG_YAML.dump(ad_cfg, sys.stdout)
 
         self.web_open(f"{self.root_url}/p-anzeige-aufgeben-schritt2.html")
 
@@ -481,9 +681,9 @@ class KleinanzeigenBot(SeleniumMixin):
             self.__set_shipping_options(ad_cfg)
         elif ad_cfg["shipping_costs"]:
             try:
-                self.web_click(By.XPATH, '//*[contains(@class, "ShippingOption")]//input[@type="radio"]')
-                self.web_click(By.XPATH, '//*[contains(@class, "CarrierOptionsPopup")]//*[contains(@class, "IndividualPriceSection")]//input[@type="checkbox"]')
-                self.web_input(By.XPATH, '//*[contains(@class, "IndividualShippingInput")]//input[@type="text"]',
+                self.web_click(By.CSS_SELECTOR, '[class*="ShippingOption"] input[type="radio"]')
+                self.web_click(By.CSS_SELECTOR, '[class*="CarrierOptionsPopup"] [class*="IndividualPriceSection"] input[type="checkbox"]')
+                self.web_input(By.CSS_SELECTOR, '[class*="IndividualShippingInput"] input[type="text"]',
                                str.replace(ad_cfg["shipping_costs"], ".", ","))
                 self.web_click(By.XPATH, '//*[contains(@class, "ReactModalPortal")]//button[.//*[text()[contains(.,"Weiter")]]]')
             except NoSuchElementException as ex:
@@ -494,9 +694,9 @@ class KleinanzeigenBot(SeleniumMixin):
         #############################
         price_type = ad_cfg["price_type"]
         if price_type != "NOT_APPLICABLE":
-            self.web_select(By.XPATH, "//select[@id='price-type-react' or @id='micro-frontend-price-type' or @id='priceType']", price_type)
+            self.web_select(By.CSS_SELECTOR, "select#price-type-react, select#micro-frontend-price-type, select#priceType", price_type)
             if safe_get(ad_cfg, "price"):
-                self.web_input(By.XPATH, "//input[@id='post-ad-frontend-price' or @id='micro-frontend-price' or @id='pstad-price']", ad_cfg["price"])
+                self.web_input(By.CSS_SELECTOR, "input#post-ad-frontend-price, input#micro-frontend-price, input#pstad-price", ad_cfg["price"])
 
         #############################
         # set sell_directly
@@ -505,16 +705,16 @@ class KleinanzeigenBot(SeleniumMixin):
         try:
             if sell_directly and ad_cfg["shipping_type"] == "SHIPPING" and ad_cfg["shipping_options"] and price_type in {"FIXED", "NEGOTIABLE"}:
                 if not self.webdriver.find_element(By.ID, "buy-now-toggle").is_selected():
-                    self.web_click(By.XPATH, '//*[contains(@class, "BuyNowSection")]//span[contains(@class, "Toggle--Slider")]')
+                    self.web_click(By.CSS_SELECTOR, '[class*="BuyNowSection"] span[class*="Toggle--Slider"]')
             elif self.webdriver.find_element(By.ID, "buy-now-toggle").is_selected():
-                self.web_click(By.XPATH, '//*[contains(@class, "BuyNowSection")]//span[contains(@class, "Toggle--Slider")]')
+                self.web_click(By.CSS_SELECTOR, '[class*="BuyNowSection"] span[class*="Toggle--Slider"]')
         except NoSuchElementException as ex:
             LOG.debug(ex, exc_info = True)
 
         #############################
         # set description
         #############################
-        self.web_execute("document.querySelector('#pstad-descrptn').value = `" + ad_cfg["description"].replace("`", "'") + "`")
+        self.web_execute(f"document.querySelector('#pstad-descrptn').value = {json.dumps(ad_cfg['description'])}")
 
         #############################
         # set contact zipcode
@@ -571,7 +771,7 @@ class KleinanzeigenBot(SeleniumMixin):
             self.web_click(By.XPATH, "//fieldset[@id='postad-publish']//*[contains(text(),'Anzeige aufgeben')]")
             self.web_click(By.ID, "imprint-guidance-submit")
 
-        self.web_await(EC.url_contains("p-anzeige-aufgeben-bestaetigung.html?adId="), 20)
+        self.web_await(PUBLISH_CONFIRMATION_URL_CONTAINED, 20, poll_frequency = 0.1)
 
         ad_cfg_orig["updated_on"] = datetime.utcnow().isoformat()
         if not ad_cfg["created_on"] and not ad_cfg["id"]:
@@ -584,7 +784,7 @@ class KleinanzeigenBot(SeleniumMixin):
 
         LOG.info(" -> SUCCESS: ad published with ID %s", ad_id)
 
-        utils.save_dict(ad_file, ad_cfg_orig)
+        _save_ad_metadata(ad_file, ad_cfg_orig)
 
     def __set_category(self, ad_file:str, ad_cfg: dict[str, Any]):
         # click on something to trigger automatic category detection
@@ -628,18 +828,8 @@ class KleinanzeigenBot(SeleniumMixin):
 
     def __set_shipping_options(self, ad_cfg: dict[str, Any]) -> None:
         try:
-            shipping_option_mapping = {
-                "DHL_2": ("Klein", "Paket 2 kg"),
-                "Hermes_Päckchen": ("Klein", "Päckchen"),
-                "Hermes_S": ("Klein", "S-Paket"),
-                "DHL_5": ("Mittel", "Paket 5 kg"),
-                "Hermes_M": ("Mittel", "M-Paket"),
-                "DHL_10": ("Mittel", "Paket 10 kg"),
-                "DHL_31,5": ("Groß", "Paket 31,5 kg"),
-                "Hermes_L": ("Groß", "L-Paket"),
-            }
             try:
-                mapped_shipping_options = [shipping_option_mapping[option] for option in ad_cfg["shipping_options"]]
+                mapped_shipping_options = [SHIPPING_OPTION_MAPPING[option] for option in ad_cfg["shipping_options"]]
                 shipping_sizes, shipping_packages = zip(*mapped_shipping_options)
             except KeyError as ex:
                 raise KeyError(f"Unknown shipping option(s), please refer to the documentation/README: {ad_cfg['shipping_options']}") from ex
@@ -649,15 +839,13 @@ class KleinanzeigenBot(SeleniumMixin):
                 raise ValueError("You can only specify shipping options for one package size!")
 
             shipping_size, = unique_shipping_sizes
-            self.web_click(By.XPATH, f'//*[contains(@class, "ShippingOption")]//input[@type="radio" and @data-testid="{shipping_size}"]')
+            self.web_click(By.CSS_SELECTOR, SHIPPING_SIZE_RADIO_SELECTOR.format(size = shipping_size))
 
-            for shipping_package in shipping_packages:
-                self.web_click(
-                    By.XPATH,
-                    '//*[contains(@class, "CarrierOptionsPopup")]'
-                    '//*[contains(@class, "CarrierOption")]'
-                    f'//input[@type="checkbox" and @data-testid="{shipping_package}"]'
-                )
+            # wait for the carrier options to show up, then check all packages in one go
+            self.web_find(By.CSS_SELECTOR, SHIPPING_PACKAGE_CHECKBOX_SELECTOR.format(package = shipping_packages[0]))
+            missing_packages = self.webdriver.execute_script(CHECK_SHIPPING_PACKAGES_JS, SHIPPING_PACKAGE_CHECKBOX_SELECTOR, list(shipping_packages))
+            if missing_packages:
+                raise NoSuchElementException(f"Checkbox(es) for shipping package(s) {missing_packages} not found")
 
             self.web_click(By.XPATH, '//*[contains(@class, "ReactModalPortal")]//button[.//*[text()[contains(.,"Weiter")]]]')
         except NoSuchElementException as ex:
@@ -668,25 +856,24 @@ class KleinanzeigenBot(SeleniumMixin):
         image_upload = self.web_find(By.XPATH, "//input[@type='file']")
 
         def count_uploaded_images() -> int:
-            return len(self.webdriver.find_elements(By.CLASS_NAME, "imagebox-new-thumbnail"))
+            return self.web_execute("return document.getElementsByClassName('imagebox-new-thumbnail').length")  # type: ignore[no-any-return]
 
         for image in ad_cfg["images"]:
             LOG.info(" -> uploading image [%s]", image)
             previous_uploaded_images_count = count_uploaded_images()
             image_upload.send_keys(image)
             start_at = time.time()
-            while previous_uploaded_images_count == count_uploaded_images() and time.time() - start_at < 60:
-                print(".", end = "", flush = True)
-                time.sleep(1)
-            print(flush = True)
-
-            ensure(previous_uploaded_images_count < count_uploaded_images(), f"Couldn't upload image [{image}] within 60 seconds")
+            self.web_await(
+                lambda _, previous_count = previous_uploaded_images_count: count_uploaded_images() > previous_count,
+                timeout = 60,
+                exception_on_timeout = lambda image = image: AssertionError(f"Couldn't upload image [{image}] within 60 seconds"),
+                poll_frequency = 0.25
+            )
             LOG.debug("   => uploaded image within %i seconds", time.time() - start_at)
-            pause(2000)
 
     def assert_free_ad_limit_not_reached(self) -> None:
         try:
-            self.web_find(By.XPATH, '/html/body/div[1]/form/fieldset[6]/div[1]/header')
+            self.web_find(By.XPATH, FREE_AD_LIMIT_HEADER_XPATH)
             raise AssertionError(f"Cannot publish more ads. The monthly limit of free ads of account {self.config['login']['username']} is reached.")
         except NoSuchElementException:
             pass
@@ -695,12 +882,11 @@ class KleinanzeigenBot(SeleniumMixin):
     def web_open(self, url:str, timeout:float = 15, reload_if_already_open:bool = False) -> None:
         start_at = time.time()
         super().web_open(url, timeout, reload_if_already_open)
-        pause(2000)
 
         # reload the page until no fullscreen ad is displayed anymore
         while True:
             try:
-                self.web_find(By.XPATH, "/html/body/header[@id='site-header']", 2)
+                self.web_find(By.XPATH, SITE_HEADER_XPATH, 2)
                 return
             except NoSuchElementException as ex:
                 elapsed = time.time() - start_at
@@ -726,14 +912,24 @@ class KleinanzeigenBot(SeleniumMixin):
             self.web_input(By.XPATH, '//*[@id="site-search-query"]', str(id_))
             # navigate to ad page and wait
             submit_button = self.webdriver.find_element(By.XPATH, '//*[@id="site-search-submit"]')
-            self.web_await(EC.element_to_be_clickable(submit_button), 15)
             try:
                 submit_button.click()
             except ElementClickInterceptedException:  # sometimes: special banner might pop up and intercept
                 LOG.warning('Waiting for unexpected element to close...')
                 pause(6000, 10000)
                 submit_button.click()
-        pause(1000, 2000)
+            try:
+                self.web_await(EC.staleness_of(submit_button), 15)
+            except TimeoutException:
+                LOG.debug('The search page was not left within 15 seconds.')
+
+        def ad_page_or_search_result_shown(driver:WebDriver) -> bool:
+            return driver.current_url.endswith('k0') or len(driver.find_elements(By.CSS_SELECTOR, '#viewad-title, #vap-ovrly-secure')) > 0
+
+        try:
+            self.web_await(ad_page_or_search_result_shown, 5, poll_frequency = 0.2)
+        except TimeoutException:
+            LOG.debug('Neither an ad page nor an empty search result was shown within 5 seconds.')
 
         # handle the case that invalid ad ID given
         if self.webdriver.current_url.endswith('k0'):
@@ -744,9 +940,11 @@ class KleinanzeigenBot(SeleniumMixin):
             LOG.warning('A popup appeared.')
             close_button = self.webdriver.find_element(By.CLASS_NAME, 'mfp-close')
             close_button.click()
-            time.sleep(1)
+            self.web_await(EC.invisibility_of_element_located((By.CSS_SELECTOR, '#vap-ovrly-secure')), 3, poll_frequency = 0.2)
         except NoSuchElementException:
             print('(no popup)')
+        except TimeoutException:
+            LOG.warning('The popup did not close within 3 seconds.')
         return True
 
     def download_images_from_ad_page(self, directory:str, ad_id:int, logger:logging.Logger) -> list[str]:
@@ -779,33 +977,28 @@ class KleinanzeigenBot(SeleniumMixin):
             except (NoSuchElementException, IndexError):
                 logger.info('Only one image found.')
 
-            # download all images from box
-            img_element = image_box.find_element(By.XPATH, './/div[1]/img')
-            img_fn_prefix = 'ad_' + str(ad_id) + '__img'
-
-            img_nr = 1
-            dl_counter = 0
-            while img_nr <= n_images:  # scrolling + downloading
-                current_img_url = img_element.get_attribute('src')  # URL of the image
-                file_ending = current_img_url.split('.')[-1].lower()
-                img_path = directory + '/' + img_fn_prefix + str(img_nr) + '.' + file_ending
-                if current_img_url.startswith('https'):  # verify https (for Bandit linter)
-                    urllib.request.urlretrieve(current_img_url, img_path)  # nosec B310
-                dl_counter += 1
-                img_paths.append(img_path.split('/')[-1])
-
-                # scroll to next image (if exists)
-                if img_nr < n_images:
-                    try:
-                        # click next button, wait, and reestablish reference
-                        next_button.click()
-                        self.web_await(lambda _: EC.staleness_of(img_element))
-                        new_div = self.webdriver.find_element(By.CSS_SELECTOR, f'div.galleryimage-element:nth-child({img_nr + 1})')
-                        img_element = new_div.find_element(By.XPATH, './/img')
-                    except NoSuchElementException:
-                        logger.error('NEXT button in image gallery somehow missing, abort image fetching.')
-                        break
-                img_nr += 1
+            # the gallery usually contains the elements of all images at once, only page through it if images are missing
+            gallery_img_urls:list[str] = self.webdriver.execute_script(GALLERY_IMAGE_URLS_JS)
+            if len(gallery_img_urls) < n_images:
+                gallery_img_urls = self.__page_through_gallery(image_box, n_images, next_button, logger)
+
+            img_fn_prefix = f'ad_{ad_id}__img'
+            img_urls:list[str] = []
+            img_files:list[str] = []
+            for img_nr, current_img_url in enumerate(gallery_img_urls[:n_images], 1):
+                img_url_parts = urllib.parse.urlsplit(current_img_url)
+                if img_url_parts.scheme != 'https':  # verify https (for Bandit linter)
+                    logger.warning('Skipping image with non-https URL [%s].', current_img_url)
+                    continue
+                file_ending = posixpath.splitext(img_url_parts.path)[1][1:].lower() or 'jpg'
+                img_file_name = f'{img_fn_prefix}{img_nr}.{file_ending}'
+                img_urls.append(current_img_url)
+                img_files.append(os.path.join(directory, img_file_name))
+                img_paths.append(img_file_name)
+
+            # download all images at once, the connection pool reuses the connections to the image host
+            with ThreadPoolExecutor(max_workers = IMAGE_DOWNLOAD_WORKERS) as executor:
+                dl_counter = len(list(executor.map(self.__download_image, img_urls, img_files)))
             logger.info('Downloaded %d image(s).', dl_counter)
 
         except NoSuchElementException:  # some ads do not require images
@@ -813,6 +1006,44 @@ class KleinanzeigenBot(SeleniumMixin):
 
         return img_paths
 
+    def __page_through_gallery(self, image_box:WebElement, n_images:int, next_button:WebElement | None, logger:logging.Logger) -> list[str]:
+        """
+        Collects the image URLs of a gallery that only contains the currently shown image by clicking through it.
+
+        :return: the URLs of the images in order of appearance
+        """
+        img_element = image_box.find_element(By.XPATH, './/div[1]/img')
+        img_urls = [img_element.get_attribute('src')]
+        if next_button is None:  # the image counter was found, but no button to page through the gallery
+            if n_images > 1:
+                logger.error('NEXT button in image gallery missing, only fetching the first image.')
+            return img_urls
+
+        for img_nr in range(2, n_images + 1):
+            try:
+                # click next button, wait, and reestablish reference
+                next_button.click()
+                try:
+                    self.web_await(EC.staleness_of(img_element))
+                except TimeoutException:
+                    logger.debug('Image element of the gallery was not replaced after clicking NEXT.')
+                new_div = self.webdriver.find_element(By.CSS_SELECTOR, f'div.galleryimage-element:nth-child({img_nr})')
+                img_element = new_div.find_element(By.XPATH, './/img')
+            except NoSuchElementException:
+                logger.error('NEXT button in image gallery somehow missing, abort image fetching.')
+                break
+            img_urls.append(img_element.get_attribute('src'))
+        return img_urls
+
+    def __download_image(self, url:str, path:str) -> None:
+        response = self.http.request("GET", url, preload_content = False, timeout = 30)
+        try:
+            ensure(response.status == 200, f"Downloading image [{url}] failed with HTTP status {response.status}")
+            with open(path, "wb") as file:
+                shutil.copyfileobj(response, file, 64 * 1024)  # stream the image instead of buffering it completely
+        finally:
+            response.release_conn()
+
     def extract_ad_page_info(self, directory:str, id_:int) -> dict:
         """
         Extracts all necessary information from an ad´s page.
@@ -829,11 +1060,13 @@ class KleinanzeigenBot(SeleniumMixin):
         else:
             o_type = 'WANTED'
         info['type'] = o_type
-        title:str = self.webdriver.find_element(By.CSS_SELECTOR, '#viewad-title').text
-        LOG.info('Extracting information from ad with title \"%s\"', title)
-        info['title'] = title
-        descr:str = self.webdriver.find_element(By.XPATH, '//*[@id="viewad-description-text"]').text
-        info['description'] = descr
+        page_texts:dict[str, str] = self.webdriver.execute_script(AD_PAGE_TEXTS_JS, AD_CREATION_DATE_SELECTOR, AD_CREATION_DATE_XPATH)
+        for name, text in page_texts.items():
+            if text is None:
+                raise NoSuchElementException(f"Element for the {name.replace('_', ' ')} of the ad not found")
+        LOG.info('Extracting information from ad with title \"%s\"', page_texts['title'])
+        info['title'] = page_texts['title']
+        info['description'] = page_texts['description']
 
         extractor = extract.AdExtractor(self.webdriver)
 
@@ -860,17 +1093,8 @@ class KleinanzeigenBot(SeleniumMixin):
         info['republication_interval'] = 7  # a default value for downloaded ads
         info['id'] = id_
 
-        try:  # try different locations known for creation date element
-            creation_date = self.webdriver.find_element(By.XPATH, '/html/body/div[1]/div[2]/div/section[2]/section/section/article/div[3]/div[2]/div[2]/'
-                                                                  'div[1]/span').text
-        except NoSuchElementException:
-            creation_date = self.webdriver.find_element(By.CSS_SELECTOR, '#viewad-extra-info > div:nth-child(1) > span:nth-child(2)').text
-
         # convert creation date to ISO format
-        created_parts = creation_date.split('.')
-        creation_date = created_parts[2] + '-' + created_parts[1] + '-' + created_parts[0] + ' 00:00:00'
-        creation_date = datetime.fromisoformat(creation_date).isoformat()
-        info['created_on'] = creation_date
+        info['created_on'] = datetime.strptime(page_texts['creation_date'], '%d.%m.%Y').isoformat()
         info['updated_on'] = None  # will be set later on
 
         return info
@@ -886,20 +1110,24 @@ class KleinanzeigenBot(SeleniumMixin):
         # create sub-directory for ad(s) to download (if necessary):
         relative_directory = 'downloaded-ads'
         # make sure configured base directory exists
-        if not os.path.exists(relative_directory) or not os.path.isdir(relative_directory):
+        try:
             os.mkdir(relative_directory)
             LOG.info('Created ads directory at /%s.', relative_directory)
+        except FileExistsError:
+            pass
 
         new_base_dir = os.path.join(relative_directory, f'ad_{id_}')
-        if os.path.exists(new_base_dir):
-            LOG.info('Deleting current folder of ad...')
+        try:
             shutil.rmtree(new_base_dir)
+            LOG.info('Deleted current folder of ad.')
+        except FileNotFoundError:
+            pass
         os.mkdir(new_base_dir)
         LOG.info('New directory for ad created at %s.', new_base_dir)
 
         # call extraction function
         info = self.extract_ad_page_info(new_base_dir, id_)
-        ad_file_path = new_base_dir + '/' + f'ad_{id_}.yaml'
+        ad_file_path = os.path.join(new_base_dir, f'ad_{id_}.yaml')
         utils.save_dict(ad_file_path, info)
 
     def start_download_routine(self):
@@ -928,32 +1156,24 @@ class KleinanzeigenBot(SeleniumMixin):
                 LOG.info("%d of %d ads were downloaded from your profile.", success_count, len(refs))
 
             elif self.ads_selector == 'new':  # download only unsaved ads
-                # determine ad IDs from links
-                ref_ad_ids = [utils.extract_ad_id_from_ad_link(r) for r in refs]
-                ref_pairs = list(zip(refs, ref_ad_ids))
-
                 # check which ads already saved
-                saved_ad_ids = []
-                ads = self.load_ads(ignore_inactive=False, check_id=False)  # do not skip because of existing IDs
-                for ad_ in ads:
-                    ad_id = int(ad_[2]['id'])
-                    saved_ad_ids.append(ad_id)
+                saved_ad_ids = self.__get_saved_ad_ids()
 
                 LOG.info('Start fetch task for your unsaved ads!')
                 new_count = 0
-                for ref_pair in ref_pairs:
+                for ref in refs:
                     # check if ad with ID already saved
-                    id_: int = ref_pair[1]
+                    id_: int = utils.extract_ad_id_from_ad_link(ref)
                     if id_ in saved_ad_ids:
                         LOG.info('The ad with id %d has already been saved.', id_)
                         continue
 
-                    if self.navigate_to_ad_page(url = ref_pair[0]):
+                    if self.navigate_to_ad_page(url = ref):
                         self.download_ad_page(id_)
                         new_count += 1
                 LOG.info('%d new ad(s) were downloaded from your profile.', new_count)
 
-        elif re.compile(r'\d+[,\d+]*').search(self.ads_selector):  # download ad(s) with specific id(s)
+        elif ADS_ID_LIST_PATTERN.fullmatch(self.ads_selector):  # download ad(s) with specific id(s)
             ids = [int(n) for n in self.ads_selector.split(',')]
             LOG.info('Start fetch task for the ad(s) with the id(s):')
             LOG.info(' | '.join([str(id_) for id_ in ids]))
@@ -233,17 +233,19 @@ class SeleniumMixin:
         LOG.warning("Installed browser could not be detected")
         return None
 
-    def web_await(self, condition: Callable[[WebDriver], T], timeout:float = 5, exception_on_timeout: Callable[[], Exception] | None = None) -> T:
+    def web_await(self, condition: Callable[[WebDriver], T], timeout:float = 5, exception_on_timeout: Callable[[], Exception] | None = None,
+                  poll_frequency:float = 0.5) -> T:
         """
         Blocks/waits until the given condition is met.
 
         :param timeout: timeout in seconds
+        :param poll_frequency: sleep interval between condition checks in seconds
         :raises TimeoutException: if element could not be found within time
         """
         max_attempts = 2
         for attempt in range(max_attempts + 1)[1:]:
             try:
-                return WebDriverWait(self.webdriver, timeout).until(condition)  # type: ignore[no-any-return]
+                return WebDriverWait(self.webdriver, timeout, poll_frequency = poll_frequency).until(condition)  # type: ignore[no-any-return]
             except TimeoutException as ex:
                 if exception_on_timeout:
                     raise exception_on_timeout() from ex
@@ -321,7 +323,14 @@ class SeleniumMixin:
         WebDriverWait(self.webdriver, timeout).until(lambda _: self.web_execute("return document.readyState") == "complete")
 
     # pylint: disable=dangerous-default-value
-    def web_request(self, url:str, method:str = "GET", valid_response_codes:Iterable[int] = [200], headers:dict[str, str] | None = None) -> dict[str, Any]:
+    def web_request(self, url:str, method:str = "GET", valid_response_codes:Iterable[int] = [200], headers:dict[str, str] | None = None,  # pylint: disable=too-many-arguments
+                    parse_json:bool = False) -> dict[str, Any]:
+        """
+        Performs an HTTP request in the context of the current page.
+
+        :param parse_json: if True the content of successful responses is parsed as JSON by the browser, i.e. it is not
+            transferred as a JSON string inside the WebDriver's JSON response which would need to be decoded a second time
+        """
         method = method.upper()
         LOG.debug(" -> HTTP %s [%s]...", method, url)
         response:dict[str, Any] = self.webdriver.execute_async_script(f"""
@@ -338,15 +347,25 @@ class SeleniumMixin:
                     "statusCode": response.status,
                     "statusMessage": response.statusText,
                     "headers": headers,
-                    "content": responseText
+                    "content": {"response.ok ? JSON.parse(responseText) : responseText" if parse_json else "responseText"}
                 }})
             }}))
+            .catch(error => callback({{"error": error.toString()}}));
         """)
+        ensure("error" not in response, f'Processing the response of HTTP {method} to {url} failed: {response.get("error")}')
         ensure(
             response["statusCode"] in valid_response_codes,
             f'Invalid response "{response["statusCode"]} response["statusMessage"]" received for HTTP {method} to {url}'
         )
         return response
+
+    def web_request_json(self, url:str, method:str = "GET", valid_response_codes:Iterable[int] = [200], headers:dict[str, str] | None = None) -> Any:
+        """
+        Performs an HTTP request in the context of the current page.
+
+        :return: the response content parsed as JSON
+        """
+        return self.web_request(url, method, valid_response_codes, headers, parse_json = True)["content"]
     # pylint: enable=dangerous-default-value
 
     def web_scroll_page_down(self, scroll_length: int = 10, scroll_speed: int = 10000, scroll_back_top: bool = False):
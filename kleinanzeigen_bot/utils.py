@@ -2,15 +2,21 @@
 Copyright (C) 2022 Sebastian Thomschke and contributors
 SPDX-License-Identifier: AGPL-3.0-or-later
 """
-import copy, decimal, json, logging, os, re, secrets, sys, traceback, time
+import decimal, functools, json, logging, os, re, secrets, sys, traceback, time
 from importlib.resources import read_text as get_resource_as_string
 from collections.abc import Callable, Sized
 from datetime import datetime
 from types import FrameType, ModuleType, TracebackType
 from typing import Any, Final, TypeVar
 
-import coloredlogs, inflect
+import coloredlogs, inflect, yaml
 from ruamel.yaml import YAML
+from wcmatch import glob
+
+try:
+    from yaml import CSafeLoader as _BaseSafeLoader  # libyaml based C implementation
+except ImportError:
+    from yaml import SafeLoader as _BaseSafeLoader  # type: ignore[assignment]
 
 LOG_ROOT:Final[logging.Logger] = logging.getLogger()
 LOG:Final[logging.Logger] = logging.getLogger("kleinanzeigen_bot.utils")
@@ -18,6 +24,60 @@ LOG:Final[logging.Logger] = logging.getLogger("kleinanzeigen_bot.utils")
 # https://mypy.readthedocs.io/en/stable/generics.html#generic-functions
 T = TypeVar('T')
 
+GLOB_FLAGS:Final[int] = glob.GLOBSTAR | glob.BRACE | glob.EXTGLOB
+
+# shared round-trip instance, setting up a ruamel.yaml parser/emitter is comparatively expensive
+_YAML_RT:Final[YAML] = YAML(typ = "rt")
+_YAML_RT.preserve_quotes = True
+_YAML_RT.indent(mapping = 2, sequence = 4, offset = 2)
+_YAML_RT.allow_duplicate_keys = False
+_YAML_RT.explicit_start = False
+
+
+class _SafeLoader(_BaseSafeLoader):  # pylint: disable=too-many-ancestors
+    """
+    Fast YAML loader that resolves booleans and numbers like ruamel.yaml's YAML 1.2 default,
+    i.e. `yes`/`no`/`on`/`off` remain strings, leading zeros do not denote octal numbers, `_` separators, `0b` and exponents
+    without a fraction are supported and sexagesimal numbers are not.
+
+    Unlike ruamel.yaml numbers are loaded as plain int/float, a plain `=` as string instead of a tagged scalar
+    and a plain `<<` value is rejected instead of being loaded as a tagged scalar.
+    """
+
+
+_SafeLoader.yaml_implicit_resolvers = {
+    first_char: [(tag, regexp) for tag, regexp in resolvers
+        if tag not in {"tag:yaml.org,2002:bool", "tag:yaml.org,2002:float", "tag:yaml.org,2002:int", "tag:yaml.org,2002:value"}]
+    for first_char, resolvers in _BaseSafeLoader.yaml_implicit_resolvers.items()
+}
+# regular expressions of ruamel.yaml's YAML 1.2 resolver
+_SafeLoader.add_implicit_resolver("tag:yaml.org,2002:bool",
+    re.compile(r"^(?:true|True|TRUE|false|False|FALSE)$"), list("tTfF"))
+_SafeLoader.add_implicit_resolver("tag:yaml.org,2002:float",
+    re.compile(r"""^(?:
+         [-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+]?[0-9]+)?
+        |[-+]?(?:[0-9][0-9_]*)(?:[eE][-+]?[0-9]+)
+        |[-+]?\.[0-9_]+(?:[eE][-+][0-9]+)?
+        |[-+]?\.(?:inf|Inf|INF)
+        |\.(?:nan|NaN|NAN))$""", re.X), list("-+0123456789."))
+_SafeLoader.add_implicit_resolver("tag:yaml.org,2002:int",
+    re.compile(r"""^(?:[-+]?0b[0-1_]+
+        |[-+]?0o?[0-7_]+
+        |[-+]?[0-9_]+
+        |[-+]?0x[0-9a-fA-F_]+)$""", re.X), list("-+0123456789"))
+
+
+def _construct_yaml12_int(loader:_SafeLoader, node:yaml.ScalarNode) -> int:
+    value = loader.construct_scalar(node).replace("_", "")
+    sign = -1 if value.startswith("-") else 1
+    value = value.lstrip("+-")
+    if value[:2] in {"0b", "0o", "0x"}:
+        return sign * int(value[2:], {"b": 2, "o": 8, "x": 16}[value[1]])
+    return sign * int(value)
+
+
+_SafeLoader.add_constructor("tag:yaml.org,2002:int", _construct_yaml12_int)
+
 
 def abspath(relative_path:str, relative_to:str | None = None) -> str:
     """
@@ -59,6 +119,65 @@ def ensure(condition:Any | bool | Callable[[], bool], error_message:str, timeout
         time.sleep(poll_requency)
 
 
+def list_files(root_dir:str, recursive:bool = True) -> list[str]:
+    """
+    Lists the files of the given directory, skipping hidden directories.
+    Like wcmatch's globstar, the recursive listing does not descend into symlinked directories, `root_dir` itself may be a symlink though.
+
+    :param recursive: if True the files of all sub directories are listed too
+    :return: the file paths relative to `root_dir`
+    """
+    try:
+        if not recursive:
+            with os.scandir(root_dir) as entries:
+                return [entry.name for entry in entries if entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+    files:list[str] = []
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith(".")]
+        rel_dir = os.path.relpath(dir_path, root_dir)
+        files.extend(file_names if rel_dir == "." else (os.path.join(rel_dir, file_name) for file_name in file_names))
+    return files
+
+
+def glob_files(root_dir:str, pattern:str, file_listings:dict[str, list[str]]) -> list[str]:
+    """
+    Resolves a glob pattern relative to the given directory.
+
+    Only the directory named by the pattern's literal prefix is listed, recursively only if the remainder contains `**`.
+    The listings are cached in `file_listings`, i.e. patterns sharing the same prefix are resolved with a single listing.
+    Patterns the listings can't represent are resolved via wcmatch's glob.
+
+    :param file_listings: cache of `list_files` results by directory, shared between calls
+    :return: the matching file paths, relative to `root_dir` unless the pattern is absolute
+    """
+    while pattern.startswith("./"):
+        pattern = pattern[2:]
+    segments = pattern.split("/")
+    literal_segments = 0
+    while literal_segments < len(segments) and not glob.is_magic(segments[literal_segments], flags = GLOB_FLAGS):
+        literal_segments += 1
+    prefix, remainder = segments[:literal_segments], segments[literal_segments:]
+
+    if not remainder:  # plain file path
+        return [pattern] if os.path.isfile(os.path.join(root_dir, pattern)) else []
+
+    if os.path.isabs(pattern) or any(segment.startswith(".") for segment in segments) or any(segment != "**" for segment in remainder[:-1]):
+        # patterns pointing outside of root_dir, into hidden directories or with wildcard directory names
+        # (which may match symlinked directories glob would follow) are not covered by the listings
+        return [file for file in glob.glob(pattern, root_dir = root_dir, flags = GLOB_FLAGS) if os.path.isfile(os.path.join(root_dir, file))]
+
+    list_dir = os.path.join(root_dir, *prefix)
+    recursive = "**" in remainder
+    listing_key = os.path.join(list_dir, "**") if recursive else list_dir
+    if listing_key not in file_listings:
+        file_listings[listing_key] = list_files(list_dir, recursive)
+    files:list[str] = glob.globfilter(file_listings[listing_key], "/".join(remainder), flags = GLOB_FLAGS)  # type: ignore[assignment]
+    return [os.path.join(*prefix, file) for file in files] if prefix else files
+
+
 def is_frozen() -> bool:
     """
     >>> is_frozen()
@@ -67,6 +186,23 @@ def is_frozen() -> bool:
     return getattr(sys, "frozen", False)
 
 
+def clone(value:T) -> T:
+    """
+    Fast deep copy for trees of dicts and lists as produced by JSON/YAML parsers.
+    Other values are considered immutable and are not copied.
+
+    >>> orig = {"foo": ["bar", {"baz": 1}]}
+    >>> copied = clone(orig)
+    >>> copied == orig, copied["foo"] is orig["foo"], copied["foo"][1] is orig["foo"][1]
+    (True, False, False)
+    """
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}  # type: ignore[return-value]
+    if isinstance(value, list):
+        return [clone(v) for v in value]  # type: ignore[return-value]
+    return value
+
+
 def apply_defaults(
     target:dict[Any, Any],
     defaults:dict[Any, Any],
@@ -92,12 +228,51 @@ def apply_defaults(
             if isinstance(target[key], dict) and isinstance(default_value, dict):
                 apply_defaults(target[key], default_value, ignore = ignore)
             elif override(key, target[key]):
-                target[key] = copy.deepcopy(default_value)
+                target[key] = clone(default_value)
         elif not ignore(key, default_value):
-            target[key] = copy.deepcopy(default_value)
+            target[key] = clone(default_value)
     return target
 
 
+def compile_defaults_applier(
+    defaults:dict[Any, Any],
+    ignore:Callable[[Any, Any], bool] = lambda _k, _v: False,
+    override:Callable[[Any, Any], bool] = lambda _k, _v: False
+) -> Callable[[dict[Any, Any]], dict[Any, Any]]:
+    """
+    Creates a function equivalent to `apply_defaults(target, defaults, ignore, override)`
+    that evaluates everything not depending on the target only once.
+    Intended for applying the same defaults to many targets, `defaults` must not be modified afterwards.
+
+    >>> apply = compile_defaults_applier({"foo": "bar", "baz": {"a": [1]}}, ignore = lambda k, _: k == "a", override = lambda _, v: v == "")
+    >>> apply({"foo": ""})
+    {'foo': 'bar', 'baz': {'a': [1]}}
+    >>> apply({"baz": {}})
+    {'baz': {}, 'foo': 'bar'}
+    """
+    steps = [(
+        key,
+        default_value,
+        isinstance(default_value, (dict, list)),  # needs to be copied
+        compile_defaults_applier(default_value, ignore = ignore) if isinstance(default_value, dict) else None,
+        ignore(key, default_value)
+    ) for key, default_value in defaults.items()]
+
+    def apply(target:dict[Any, Any]) -> dict[Any, Any]:
+        for key, default_value, is_mutable, apply_nested, is_ignored in steps:
+            if key in target:
+                value = target[key]
+                if apply_nested and isinstance(value, dict):
+                    apply_nested(value)
+                elif override(key, value):
+                    target[key] = clone(default_value) if is_mutable else default_value
+            elif not is_ignored:
+                target[key] = clone(default_value) if is_mutable else default_value
+        return target
+
+    return apply
+
+
 def safe_get(a_map:dict[Any, Any], *keys:str) -> Any:
     """
     >>> safe_get({"foo": {}}, "foo", "bar") is None
@@ -178,17 +353,19 @@ def pluralize(word:str, count:int | Sized, prefix:bool = True) -> str:
     return plural
 
 
-def load_dict(filepath:str, content_label:str = "") -> dict[str, Any]:
+def load_dict(filepath:str, content_label:str = "", *, preserve_comments:bool = False) -> dict[str, Any]:
     """
+    :param preserve_comments: if True the content is loaded via ruamel.yaml's round-trip loader,
+        i.e. comments and formatting are retained when the dict is later written using `save_dict`
     :raises FileNotFoundError
     """
-    data = load_dict_if_exists(filepath, content_label)
+    data = load_dict_if_exists(filepath, content_label, preserve_comments = preserve_comments)
     if data is None:
         raise FileNotFoundError(filepath)
     return data
 
 
-def load_dict_if_exists(filepath:str, content_label:str = "") -> dict[str, Any] | None:
+def load_dict_if_exists(filepath:str, content_label:str = "", *, preserve_comments:bool = False) -> dict[str, Any] | None:
     filepath = os.path.abspath(filepath)
     LOG.info("Loading %s[%s]...", content_label and content_label + " from " or "", filepath)
 
@@ -200,11 +377,18 @@ def load_dict_if_exists(filepath:str, content_label:str = "") -> dict[str, Any]
         return None
 
     with open(filepath, encoding = "utf-8") as file:
-        return json.load(file) if filepath.endswith(".json") else YAML().load(file)
+        if file_ext == ".json":
+            return json.load(file)  # type: ignore[no-any-return]
+        return _YAML_RT.load(file) if preserve_comments else yaml.load(file, Loader = _SafeLoader)  # nosec B506
 
 
-def load_dict_from_module(module:ModuleType, filename:str, content_label:str = "") -> dict[str, Any]:
+@functools.lru_cache(maxsize = None)
+def load_dict_from_module(module:ModuleType, filename:str, content_label:str = "", *, preserve_comments:bool = False) -> dict[str, Any]:
     """
+    Loads a packaged resource file. The result is cached, i.e. the returned dict is shared between callers and must not be modified.
+
+    :param preserve_comments: if True the content is loaded via ruamel.yaml's round-trip loader,
+        i.e. comments and formatting are retained when the dict is later written using `save_dict`
     :raises FileNotFoundError
     """
     LOG.debug("Loading %s[%s.%s]...", content_label and content_label + " from " or "", module.__name__, filename)
@@ -214,7 +398,49 @@ def load_dict_from_module(module:ModuleType, filename:str, content_label:str = "
         raise ValueError(f'Unsupported file type. The file name "{filename}" must end with *.json, *.yaml, or *.yml')
 
     content = get_resource_as_string(module, filename)
-    return json.loads(content) if filename.endswith(".json") else YAML().load(content)
+    if file_ext == ".json":
+        return json.loads(content)  # type: ignore[no-any-return]
+    return _YAML_RT.load(content) if preserve_comments else yaml.load(content, Loader = _SafeLoader)  # nosec B506
+
+
+_COLLECTION_START_TOKENS:Final = (yaml.BlockMappingStartToken, yaml.BlockSequenceStartToken, yaml.FlowMappingStartToken, yaml.FlowSequenceStartToken)
+_COLLECTION_END_TOKENS:Final = (yaml.BlockEndToken, yaml.FlowMappingEndToken, yaml.FlowSequenceEndToken)
+
+
+def peek_yaml_header(filepath:str, keys:tuple[str, ...]) -> dict[str, Any] | None:
+    """
+    Reads the given top-level scalar properties of a YAML file without constructing the whole document.
+    The file is only tokenized until all properties are found. Properties with an empty, non-scalar, tagged or aliased value are not returned.
+
+    :return: the properties found, or None if the file is no YAML file or could not be tokenized
+    """
+    if not filepath.endswith((".yaml", ".yml")):
+        return None
+    with open(filepath, encoding = "utf-8") as file:
+        loader = _SafeLoader(file.read())
+    header:dict[str, Any] = {}
+    try:
+        depth = 0
+        while len(header) < len(keys) and not loader.check_token(yaml.StreamEndToken):
+            token = loader.get_token()
+            if isinstance(token, _COLLECTION_START_TOKENS):
+                depth += 1
+            elif isinstance(token, _COLLECTION_END_TOKENS):
+                depth -= 1
+            elif depth == 1 and isinstance(token, yaml.KeyToken) and loader.check_token(yaml.ScalarToken):
+                key:yaml.ScalarToken = loader.get_token()  # type: ignore[assignment]
+                if key.value not in keys or not loader.check_token(yaml.ValueToken):
+                    continue
+                loader.get_token()
+                if loader.check_token(yaml.ScalarToken):
+                    value:yaml.ScalarToken = loader.get_token()  # type: ignore[assignment]
+                    tag = loader.resolve(yaml.ScalarNode, value.value, (value.plain, False))  # type: ignore[no-untyped-call]
+                    header[key.value] = loader.construct_object(yaml.ScalarNode(tag, value.value, style = value.style))
+    except yaml.YAMLError:
+        return None
+    finally:
+        loader.dispose()
+    return header
 
 
 def save_dict(filepath:str, content:dict[str, Any]) -> None:
@@ -224,11 +450,7 @@ def save_dict(filepath:str, content:dict[str, Any]) -> None:
         if filepath.endswith(".json"):
             file.write(json.dumps(content, indent = 2, ensure_ascii = False))
         else:
-            yaml = YAML()
-            yaml.indent(mapping = 2, sequence = 4, offset = 2)
-            yaml.allow_duplicate_keys = False
-            yaml.explicit_start = False
-            yaml.dump(content, file)
+            _YAML_RT.dump(content, file)
 
 
 def parse_decimal(number:float | int | str) -> decimal.Decimal:
@@ -256,6 +478,7 @@ def parse_decimal(number:float | int | str) -> decimal.Decimal:
             raise decimal.DecimalException(f"Invalid number format: {number}") from ex
 
 
+@functools.lru_cache(maxsize = 4096)
 def parse_datetime(date:datetime | str | None) -> datetime | None:
     """
     >>> parse_datetime(datetime(2020, 1, 1, 0, 0))
@@ -38,3 +38,61 @@ def test_pause():
         assert 99 < elapsed < 300
     else:
         assert 99 < elapsed < 120
+
+
+def test_load_dict(tmp_path):
+    ad_file = tmp_path / "ad_test.yaml"
+    ad_file.write_text("# comment\nactive: yes\nzipcode: 01067\nid: 0x10\nsell_directly: false\n", encoding = "utf-8")
+
+    ad_cfg = utils.load_dict(str(ad_file))
+    assert ad_cfg == {"active": "yes", "zipcode": 1067, "id": 16, "sell_directly": False}
+
+    numbers_file = tmp_path / "numbers.yaml"
+    numbers_file.write_text("price: 1_000\nflags: 0b101\nlimit: 1e3\nratio: +.5\nduration: 1:30.5\ntitle: =\n", encoding = "utf-8")
+    assert utils.load_dict(str(numbers_file)) == {"price": 1000, "flags": 5, "limit": 1000.0, "ratio": 0.5, "duration": "1:30.5", "title": "="}
+
+    ad_cfg = utils.load_dict(str(ad_file), preserve_comments = True)
+    utils.save_dict(str(ad_file), ad_cfg)
+    assert ad_file.read_text(encoding = "utf-8").startswith("# comment\n")
+
+
+def test_glob_files(tmp_path):
+    for file in ("ad_1.yaml", "sub/ad_2.yml", "sub/image.jpg", ".hidden/ad_3.yaml"):
+        (tmp_path / file).parent.mkdir(parents = True, exist_ok = True)
+        (tmp_path / file).touch()
+
+    file_listings:dict[str, list[str]] = {}
+    assert sorted(utils.glob_files(str(tmp_path), "./**/ad_*.{yml,yaml}", file_listings)) == ["ad_1.yaml", os.path.join("sub", "ad_2.yml")]
+    assert utils.glob_files(str(tmp_path), "sub/*.jpg", file_listings) == [os.path.join("sub", "image.jpg")]
+    assert utils.glob_files(str(tmp_path), ".hidden/ad_*.yaml", file_listings) == [os.path.join(".hidden", "ad_3.yaml")]
+    assert utils.glob_files(str(tmp_path), "sub/ad_2.yml", file_listings) == ["sub/ad_2.yml"]
+    assert sorted(file_listings) == [os.path.join(str(tmp_path), "**"), os.path.join(str(tmp_path), "sub")]
+
+
+def test_glob_files_symlinks(tmp_path):
+    (tmp_path / "real" / "sub").mkdir(parents = True)
+    (tmp_path / "real" / "ad_1.yaml").touch()
+    (tmp_path / "real" / "sub" / "ad_2.yaml").touch()
+    (tmp_path / "root").mkdir()
+    try:
+        os.symlink(tmp_path / "real", tmp_path / "root" / "ads", target_is_directory = True)
+    except OSError:  # e.g. missing privileges on Windows
+        pytest.skip("symlinks not supported")
+
+    root_dir = str(tmp_path / "root")
+    assert utils.glob_files(root_dir, "ads/ad_*.yaml", {}) == [os.path.join("ads", "ad_1.yaml")]
+    assert sorted(utils.glob_files(root_dir, "ads/**/ad_*.yaml", {})) == [os.path.join("ads", "ad_1.yaml"), os.path.join("ads", "sub", "ad_2.yaml")]
+    assert utils.glob_files(root_dir, "*/ad_*.yaml", {}) == [os.path.join("ads", "ad_1.yaml")]
+    assert utils.glob_files(root_dir, "**/ad_*.yaml", {}) == []  # like glob, globstar does not follow symlinked directories
+
+
+def test_peek_yaml_header(tmp_path):
+    ad_file = tmp_path / "ad_test.yaml"
+    ad_file.write_text("active: false # comment\ntitle: Test\ncontact:\n  id: 1\nupdated_on:\nid: '123'\ndescription: |\n  id: 2\n", encoding = "utf-8")
+    assert utils.peek_yaml_header(str(ad_file), ("active", "id", "updated_on")) == {"active": False, "id": "123"}
+    assert utils.peek_yaml_header(str(tmp_path / "ad_test.json"), ("active",)) is None
+
+    # lines of multi-line quoted scalars are not mistaken for properties
+    ad_file.write_text('title: Test\ndescription: "Great item.\nactive: false\n\nid: 42"\n', encoding = "utf-8")
+    assert utils.peek_yaml_header(str(ad_file), ("active", "id")) == {}
+    assert utils.load_dict(str(ad_file))["description"] == "Great item. active: false\nid: 42"